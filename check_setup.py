@@ -1,9 +1,14 @@
-import torch
+import importlib
+import importlib.util
 import os
 import sys
 
 
 def check_cuda():
+    # Imported lazily: torch costs 1-2 s to load and the other checks
+    # don't need it
+    import torch
+
     print("=" * 60)
     print("CHECKING CUDA SETUP")
     print("=" * 60)
@@ -39,17 +44,19 @@ def check_files():
     print("CHECKING DATA FILES")
     print("=" * 60)
 
+    # The collector writes .jsonl; plain .json is accepted for data
+    # generated before the switch
     required_files = [
-        "data/combo_training_data.json",
-        "data/pauper_cards_detailed.json",
-        "data/known_combos.json",
+        ("data/combo_training_data.jsonl", "data/combo_training_data.json"),
+        ("data/pauper_cards_detailed.jsonl", "data/pauper_cards_detailed.json"),
+        ("data/known_combos.json",),
     ]
 
     all_exist = True
-    for file in required_files:
-        exists = os.path.exists(file)
+    for candidates in required_files:
+        exists = any(os.path.exists(f) for f in candidates)
         status = "✓" if exists else "✗"
-        print(f"{status} {file}")
+        print(f"{status} {candidates[0]}")
         if not exists:
             all_exist = False
 
@@ -59,7 +66,7 @@ def check_files():
     return all_exist
 
 
-def check_imports():
+def check_imports(deep=False):
     print("\n" + "=" * 60)
     print("CHECKING PYTHON PACKAGES")
     print("=" * 60)
@@ -76,10 +83,22 @@ def check_imports():
 
     all_installed = True
     for package in packages:
-        try:
-            __import__(package)
+        if deep:
+            # Actually run each package's top-level code (slow, but proves
+            # the package loads)
+            try:
+                importlib.import_module(package)
+                installed = True
+            except ImportError:
+                installed = False
+        else:
+            # find_spec only looks the package up on disk, so nothing heavy
+            # (CUDA init, logging setup, ...) gets executed
+            installed = importlib.util.find_spec(package) is not None
+
+        if installed:
             print(f"✓ {package}")
-        except ImportError:
+        else:
             print(f"✗ {package} - NOT INSTALLED")
             all_installed = False
 
@@ -93,8 +112,11 @@ def check_imports():
 def main():
     print("\n🔍 PRE-TRAINING DIAGNOSTICS\n")
 
+    # --deep re-enables the old behavior of importing every package
+    deep = "--deep" in sys.argv
+
     cuda_ok = check_cuda()
-    imports_ok = check_imports()
+    imports_ok = check_imports(deep=deep)
     files_ok = check_files()
 
     print("\n" + "=" * 60)
@@ -1,104 +1,287 @@
-import json
 import requests
 import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from itertools import combinations
-import time
+from itertools import combinations, product
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import orjson
+
+try:
+    import hyperscan
+except ImportError:  # optional fast path
+    hyperscan = None
+
+try:
+    import ahocorasick
+except ImportError:  # optional; the stdlib regex scanner is the fallback
+    ahocorasick = None
+
+BULK_DATA_URL = "https://api.scryfall.com/bulk-data/oracle-cards"
+BULK_CACHE_PATH = Path("data/.scryfall_bulk_cache.json")
+
+# Shared session: HTTP keep-alive across requests plus automatic backoff on
+# 429/5xx responses (Retry-After is honored) instead of ad-hoc sleeps
+SESSION = requests.Session()
+SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        max_retries=Retry(
+            total=5,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            respect_retry_after_header=True,
+        )
+    ),
+)
+
+# Every keyword the ability flags in extract_card_features test for.
+# Matched in a single Aho-Corasick pass over the lowercased oracle text
+# instead of ~20 independent substring scans per card.
+_COMBO_KEYWORDS = (
+    "enters the battlefield",
+    "enter the battlefield",
+    "leaves the battlefield",
+    "leave the battlefield",
+    "dies",
+    "draw",
+    "untap",
+    "{t}:",
+    "tap:",
+    "sacrifice",
+    "return",
+    "hand",
+    "exile",
+    "create",
+    "token",
+    "add {",
+    "add one mana",
+    "storm",
+    "cost",
+    "less",
+    "reduced",
+    "owner's hand",
+    "copy",
+    "spell",
+    "instant",
+    "sorcery",
+    "search your library",
+    "from your graveyard",
+    "graveyard",
+    "to",
+)
+
+
+# Bit order of abilities_mask; matches the keys of the abilities dict
+_ABILITY_ORDER = (
+    "enters_battlefield",
+    "leaves_battlefield",
+    "dies",
+    "draw",
+    "untap",
+    "tap_ability",
+    "sacrifice",
+    "return_to_hand",
+    "flicker",
+    "create_token",
+    "add_mana",
+    "storm",
+    "cost_reduction",
+    "bounce",
+    "copy_spell",
+    "tutor",
+    "recur",
+)
+
+# Keyword groups shared by the compound ability flags, built once at import
+# so extract_card_features tests each group with a single isdisjoint call
+_ETB_PHRASES = frozenset(("enters the battlefield", "enter the battlefield"))
+_LTB_PHRASES = frozenset(("leaves the battlefield", "leave the battlefield"))
+_TAP_PHRASES = frozenset(("{t}:", "tap:"))
+_ADD_MANA_PHRASES = frozenset(("add {", "add one mana"))
+_COST_REDUCTION_WORDS = frozenset(("less", "reduced"))
+_COPY_TARGETS = frozenset(("spell", "instant", "sorcery"))
+
+
+def _build_keyword_scanner():
+    """Build a function mapping lowercased oracle text to its keyword hits.
+
+    Picks the fastest single-pass matcher available: a Hyperscan database
+    (SIMD literal matching), then a pyahocorasick automaton, then a
+    compiled stdlib regex alternation. All three return the same set of
+    matched keywords.
+    """
+    if hyperscan is not None:
+        db = hyperscan.Database()
+        db.compile(
+            expressions=[re.escape(kw).encode() for kw in _COMBO_KEYWORDS],
+            ids=list(range(len(_COMBO_KEYWORDS))),
+            flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH]
+            * len(_COMBO_KEYWORDS),
+        )
+
+        def scan(text):
+            hits = set()
+            db.scan(
+                text.encode("utf-8"),
+                match_event_handler=lambda kw_id, *_: hits.add(
+                    _COMBO_KEYWORDS[kw_id]
+                ),
+            )
+            return hits
+
+        return scan
+
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for keyword in _COMBO_KEYWORDS:
+            automaton.add_word(keyword, keyword)
+        automaton.make_automaton()
+        return lambda text: {keyword for _, keyword in automaton.iter(text)}
+
+    # Stdlib fallback: one pass with a lookahead alternation (longest
+    # keyword first). The lookahead keeps overlapping hits like "hand"
+    # inside "owner's hand"; a keyword that starts at the same position as
+    # a longer match (e.g. "to" in "token") is recovered from the
+    # containment map, so the hit set matches the automaton's exactly.
+    pattern = re.compile(
+        "(?=("
+        + "|".join(
+            re.escape(kw) for kw in sorted(_COMBO_KEYWORDS, key=len, reverse=True)
+        )
+        + "))"
+    )
+    implied = {
+        kw: [other for other in _COMBO_KEYWORDS if other != kw and other in kw]
+        for kw in _COMBO_KEYWORDS
+    }
+
+    def scan(text):
+        hits = set(pattern.findall(text))
+        for keyword in tuple(hits):
+            hits.update(implied[keyword])
+        return hits
+
+    return scan
+
+
+_scan_keywords = _build_keyword_scanner()
 
 
 def fetch_pauper_cards():
     """Fetch all Pauper-legal cards with detailed information"""
     print("Fetching Pauper-legal cards...")
 
-    all_cards = []
-    url = "https://api.scryfall.com/cards/search"
-    params = {
-        "q": "legal:pauper",
-        "format": "json",
-        "unique": "cards",  # Get unique cards, not all prints
-    }
-
-    while url:
-        response = requests.get(url, params=params)
-        if response.status_code != 200:
-            print(f"Error: {response.status_code}")
-            break
+    # Scryfall publishes a single bulk file with every oracle card, so one
+    # download replaces the old paginated cards/search crawl (and its
+    # per-page rate-limit sleeps).
+    meta = SESSION.get(BULK_DATA_URL, timeout=30)
+    if meta.status_code != 200:
+        print(f"Error: {meta.status_code}")
+        return []
+
+    bulk_info = meta.json()
+
+    # Skip the ~100 MB download when Scryfall's bulk export hasn't changed
+    # since the cached copy was written
+    if BULK_CACHE_PATH.exists():
+        cached = orjson.loads(BULK_CACHE_PATH.read_bytes())
+        if cached.get("updated_at") == bulk_info.get("updated_at"):
+            print(f"Bulk data unchanged; using {len(cached['cards'])} cached cards")
+            return cached["cards"]
+
+    print("Downloading bulk card data...")
+    response = SESSION.get(bulk_info["download_uri"], timeout=300)
+    if response.status_code != 200:
+        print(f"Error: {response.status_code}")
+        return []
+
+    all_cards = [
+        c
+        for c in response.json()
+        if c.get("legalities", {}).get("pauper") == "legal"
+    ]
+    print(f"Fetched {len(all_cards)} Pauper-legal cards")
 
-        data = response.json()
-        all_cards.extend(data.get("data", []))
-        url = data.get("next_page")
-        params = None
-        print(f"Fetched {len(all_cards)} cards...")
-        time.sleep(0.1)  # Rate limiting
+    BULK_CACHE_PATH.parent.mkdir(exist_ok=True)
+    BULK_CACHE_PATH.write_bytes(
+        orjson.dumps({"updated_at": bulk_info.get("updated_at"), "cards": all_cards})
+    )
 
     return all_cards
 
 
+def dedupe_by_oracle_id(cards):
+    """Keep one printing per oracle id, preserving order"""
+    unique = {}
+    for card in cards:
+        unique.setdefault(card.get("oracle_id") or card.get("name"), card)
+    return list(unique.values())
+
+
 def extract_card_features(card):
     """Extract detailed features for combo detection"""
     oracle_text = card.get("oracle_text", "")
+    type_line = card.get("type_line", "")
+
+    # Lowercase once and find every keyword in one scanner pass; the
+    # ability flags below are then O(1) set-membership tests.
+    text = oracle_text.lower()
+    hits = _scan_keywords(text)
+
+    # Tokenize the card types once (the part before the em dash) so the
+    # is_* flags are set lookups instead of six substring scans.
+    card_types = set(type_line.split(" — ")[0].split())
+
+    # Combo-relevant features
+    abilities = {
+        "enters_battlefield": not hits.isdisjoint(_ETB_PHRASES),
+        "leaves_battlefield": not hits.isdisjoint(_LTB_PHRASES),
+        "dies": "dies" in hits,
+        "draw": "draw" in hits,
+        "untap": "untap" in hits,
+        "tap_ability": not hits.isdisjoint(_TAP_PHRASES),
+        "sacrifice": "sacrifice" in hits,
+        "return_to_hand": "return" in hits and "hand" in hits,
+        "flicker": "exile" in hits and "return" in hits,
+        "create_token": "create" in hits and "token" in hits,
+        "add_mana": not hits.isdisjoint(_ADD_MANA_PHRASES),
+        "storm": "storm" in hits,
+        "cost_reduction": "cost" in hits
+        and not hits.isdisjoint(_COST_REDUCTION_WORDS),
+        "bounce": "return" in hits and "owner's hand" in hits,
+        "copy_spell": "copy" in hits and not hits.isdisjoint(_COPY_TARGETS),
+        "tutor": "search your library" in hits,
+        "recur": ("from your graveyard" in hits and "to" in hits)
+        or "return" in hits
+        and "graveyard" in hits,
+    }
 
     features = {
         "name": card.get("name"),
         "mana_cost": card.get("mana_cost", ""),
         "cmc": card.get("cmc", 0),
-        "type_line": card.get("type_line", ""),
+        "type_line": type_line,
         "oracle_text": oracle_text,
         "colors": card.get("colors", []),
         "color_identity": card.get("color_identity", []),
         "keywords": card.get("keywords", []),
         "power": card.get("power"),
         "toughness": card.get("toughness"),
-        # Combo-relevant features
-        "abilities": {
-            "enters_battlefield": "enters the battlefield" in oracle_text.lower()
-            or "enter the battlefield" in oracle_text.lower(),
-            "leaves_battlefield": "leaves the battlefield" in oracle_text.lower()
-            or "leave the battlefield" in oracle_text.lower(),
-            "dies": "dies" in oracle_text.lower()
-            or "when {name} dies".format(name=card.get("name", ""))
-            in oracle_text.lower(),
-            "draw": "draw" in oracle_text.lower(),
-            "untap": "untap" in oracle_text.lower(),
-            "tap_ability": "{T}:" in oracle_text or "tap:" in oracle_text.lower(),
-            "sacrifice": "sacrifice" in oracle_text.lower(),
-            "return_to_hand": "return" in oracle_text.lower()
-            and "hand" in oracle_text.lower(),
-            "flicker": "exile" in oracle_text.lower()
-            and "return" in oracle_text.lower(),
-            "create_token": "create" in oracle_text.lower()
-            and "token" in oracle_text.lower(),
-            "add_mana": "add {" in oracle_text.lower()
-            or "add one mana" in oracle_text.lower(),
-            "storm": "storm" in oracle_text.lower(),
-            "cost_reduction": "cost" in oracle_text.lower()
-            and ("less" in oracle_text.lower() or "reduced" in oracle_text.lower()),
-            "bounce": "return" in oracle_text.lower()
-            and (
-                "owner's hand" in oracle_text.lower()
-                or "its owner's hand" in oracle_text.lower()
-            ),
-            "copy_spell": "copy" in oracle_text.lower()
-            and (
-                "spell" in oracle_text.lower()
-                or "instant" in oracle_text.lower()
-                or "sorcery" in oracle_text.lower()
-            ),
-            "tutor": "search your library" in oracle_text.lower(),
-            "recur": (
-                "from your graveyard" in oracle_text.lower()
-                and "to" in oracle_text.lower()
-            )
-            or "return" in oracle_text.lower()
-            and "graveyard" in oracle_text.lower(),
-        },
+        "abilities": abilities,
+        # Same flags packed into an int (bit order: _ABILITY_ORDER) so
+        # consumers can popcount instead of summing the dict
+        "abilities_mask": sum(
+            1 << i for i, key in enumerate(_ABILITY_ORDER) if abilities[key]
+        ),
         # Card type flags
-        "is_creature": "Creature" in card.get("type_line", ""),
-        "is_instant": "Instant" in card.get("type_line", ""),
-        "is_sorcery": "Sorcery" in card.get("type_line", ""),
-        "is_artifact": "Artifact" in card.get("type_line", ""),
-        "is_enchantment": "Enchantment" in card.get("type_line", ""),
-        "is_land": "Land" in card.get("type_line", ""),
+        "is_creature": "Creature" in card_types,
+        "is_instant": "Instant" in card_types,
+        "is_sorcery": "Sorcery" in card_types,
+        "is_artifact": "Artifact" in card_types,
+        "is_enchantment": "Enchantment" in card_types,
+        "is_land": "Land" in card_types,
     }
 
     return features
@@ -259,69 +442,106 @@ def scrape_known_combos():
     return known_combos
 
 
+# Prebuilt templates for generate_potential_combos, formatted once per pair
+_ETB_FLICKER_DESC = (
+    "{flicker} can repeatedly trigger {etb}'s enters-the-battlefield ability"
+)
+_ETB_FLICKER_ANALYSIS = (
+    "When you flicker {etb} with {flicker}, you get repeated value from: "
+    "{snippet}..."
+)
+_UNTAP_TAP_DESC = "{untapper} can untap {tapper} to use its tap ability multiple times"
+_UNTAP_TAP_ANALYSIS = (
+    "By untapping {tapper}, you can use its ability more than once per turn"
+)
+_TOKEN_SAC_DESC = "{token_maker} creates tokens for {sac_outlet} to sacrifice"
+
+
 def generate_potential_combos(cards):
     """
     Programmatically generate potential combo interactions
     This creates training data for the model to learn patterns
     """
+    # Bucket cards by ability in one pass instead of one full scan per
+    # category; pair generation is then a relational join over the buckets.
+    etb_creatures = []
+    flicker_effects = []
+    untap_effects = []
+    tap_creatures = []
+    token_creators = []
+    sacrifice_outlets = []
+
+    for c in cards:
+        abilities = c["abilities"]
+        if abilities["enters_battlefield"] and c["is_creature"]:
+            etb_creatures.append(c)
+        if abilities["flicker"]:
+            flicker_effects.append(c)
+        if abilities["untap"]:
+            untap_effects.append(c)
+        if abilities["tap_ability"] and c["is_creature"]:
+            tap_creatures.append(c)
+        if abilities["create_token"]:
+            token_creators.append(c)
+        if abilities["sacrifice"]:
+            sacrifice_outlets.append(c)
+
     potential_combos = []
 
-    # Find cards that work together based on abilities
-    etb_creatures = [
-        c for c in cards if c["abilities"]["enters_battlefield"] and c["is_creature"]
-    ]
-    flicker_effects = [c for c in cards if c["abilities"]["flicker"]]
-    untap_effects = [c for c in cards if c["abilities"]["untap"]]
-    token_creators = [c for c in cards if c["abilities"]["create_token"]]
-
-    # Generate ETB + Flicker combos
-    for flicker in flicker_effects[:5]:  # Limit for performance
-        for etb in etb_creatures[:20]:
-            if flicker["name"] != etb["name"]:
-                potential_combos.append(
-                    {
-                        "cards": [flicker["name"], etb["name"]],
-                        "synergy_type": "ETB + Flicker",
-                        "description": f"{flicker['name']} can repeatedly trigger {etb['name']}'s enters-the-battlefield ability",
-                        "card1_role": "Flicker effect",
-                        "card2_role": "ETB trigger source",
-                        "analysis": f"When you flicker {etb['name']} with {flicker['name']}, you get repeated value from: {etb['oracle_text'][:100]}...",
-                    }
-                )
+    # Generate ETB + Flicker combos (limits kept for performance)
+    for flicker, etb in product(flicker_effects[:5], etb_creatures[:20]):
+        if flicker["name"] == etb["name"]:
+            continue
+        potential_combos.append(
+            {
+                "cards": [flicker["name"], etb["name"]],
+                "synergy_type": "ETB + Flicker",
+                "description": _ETB_FLICKER_DESC.format(
+                    flicker=flicker["name"], etb=etb["name"]
+                ),
+                "card1_role": "Flicker effect",
+                "card2_role": "ETB trigger source",
+                "analysis": _ETB_FLICKER_ANALYSIS.format(
+                    flicker=flicker["name"],
+                    etb=etb["name"],
+                    snippet=etb["oracle_text"][:100],
+                ),
+            }
+        )
 
     # Find untap + tap ability combos
-    tap_creatures = [
-        c for c in cards if c["abilities"]["tap_ability"] and c["is_creature"]
-    ]
-    for untapper in untap_effects[:5]:
-        for tapper in tap_creatures[:20]:
-            if untapper["name"] != tapper["name"]:
-                potential_combos.append(
-                    {
-                        "cards": [untapper["name"], tapper["name"]],
-                        "synergy_type": "Untap + Tap Ability",
-                        "description": f"{untapper['name']} can untap {tapper['name']} to use its tap ability multiple times",
-                        "card1_role": "Untap source",
-                        "card2_role": "Tap ability",
-                        "analysis": f"By untapping {tapper['name']}, you can use its ability more than once per turn",
-                    }
-                )
+    for untapper, tapper in product(untap_effects[:5], tap_creatures[:20]):
+        if untapper["name"] == tapper["name"]:
+            continue
+        potential_combos.append(
+            {
+                "cards": [untapper["name"], tapper["name"]],
+                "synergy_type": "Untap + Tap Ability",
+                "description": _UNTAP_TAP_DESC.format(
+                    untapper=untapper["name"], tapper=tapper["name"]
+                ),
+                "card1_role": "Untap source",
+                "card2_role": "Tap ability",
+                "analysis": _UNTAP_TAP_ANALYSIS.format(tapper=tapper["name"]),
+            }
+        )
 
     # Find token + sacrifice synergies
-    sacrifice_outlets = [c for c in cards if c["abilities"]["sacrifice"]]
-    for token_maker in token_creators[:10]:
-        for sac_outlet in sacrifice_outlets[:10]:
-            if token_maker["name"] != sac_outlet["name"]:
-                potential_combos.append(
-                    {
-                        "cards": [token_maker["name"], sac_outlet["name"]],
-                        "synergy_type": "Token Generation + Sacrifice",
-                        "description": f"{token_maker['name']} creates tokens for {sac_outlet['name']} to sacrifice",
-                        "card1_role": "Token generator",
-                        "card2_role": "Sacrifice outlet",
-                        "analysis": "This creates value by generating tokens to fuel sacrifice effects",
-                    }
-                )
+    for token_maker, sac_outlet in product(token_creators[:10], sacrifice_outlets[:10]):
+        if token_maker["name"] == sac_outlet["name"]:
+            continue
+        potential_combos.append(
+            {
+                "cards": [token_maker["name"], sac_outlet["name"]],
+                "synergy_type": "Token Generation + Sacrifice",
+                "description": _TOKEN_SAC_DESC.format(
+                    token_maker=token_maker["name"], sac_outlet=sac_outlet["name"]
+                ),
+                "card1_role": "Token generator",
+                "card2_role": "Sacrifice outlet",
+                "analysis": "This creates value by generating tokens to fuel sacrifice effects",
+            }
+        )
 
     return potential_combos
 
@@ -334,20 +554,26 @@ def create_reasoning_examples(cards, combos):
     examples = []
 
     # Example 1: Teach combo pattern recognition
+    # Outputs are assembled as fragment lists and joined once; repeated
+    # str + on multi-KB strings is quadratic in the number of pieces
     for combo in combos:
         if combo.get("type") == "infinite":
+            parts = [
+                "Yes, this is an infinite combo. Here's how it works:\n\n",
+                "Description: ",
+                combo["description"],
+                "\n\nSteps:\n",
+            ]
+            parts.extend(f"{i+1}. {step}\n" for i, step in enumerate(combo["steps"]))
+            parts.append("\nResult: ")
+            parts.append(combo["result"])
+            parts.append("\n\nRequirements: ")
+            parts.append(", ".join(combo["requirements"]))
             examples.append(
                 {
                     "instruction": "Analyze if these cards create an infinite combo in Pauper format.",
                     "input": f"Cards: {', '.join(combo['cards'])}",
-                    "output": f"Yes, this is an infinite combo. Here's how it works:\n\n"
-                    + f"Description: {combo['description']}\n\n"
-                    + f"Steps:\n"
-                    + "\n".join(
-                        [f"{i+1}. {step}" for i, step in enumerate(combo["steps"])]
-                    )
-                    + f"\n\nResult: {combo['result']}\n\n"
-                    + f"Requirements: {', '.join(combo['requirements'])}",
+                    "output": "".join(parts),
                 }
             )
 
@@ -363,8 +589,16 @@ def create_reasoning_examples(cards, combos):
                 {
                     "instruction": "Explain how these two cards interact in a Pauper combo.",
                     "input": f"Card 1: {card1['name']}\n{card1['oracle_text']}\n\nCard 2: {card2['name']}\n{card2['oracle_text']}",
-                    "output": f"These cards create a synergistic interaction:\n\n{combo.get('description', 'These cards work together.')}\n\n"
-                    + f"Key interaction: {combo['steps'][0] if combo.get('steps') else 'They enable each other.'}",
+                    "output": "".join(
+                        [
+                            "These cards create a synergistic interaction:\n\n",
+                            combo.get("description", "These cards work together."),
+                            "\n\nKey interaction: ",
+                            combo["steps"][0]
+                            if combo.get("steps")
+                            else "They enable each other.",
+                        ]
+                    ),
                 }
             )
 
@@ -409,19 +643,29 @@ def create_reasoning_examples(cards, combos):
 def main():
     Path("data").mkdir(exist_ok=True)
 
-    # Fetch all Pauper cards
-    cards = fetch_pauper_cards()
+    # Fetch the cards on a worker thread while the known-combo set (pure
+    # CPU, independent of the download) is built on this one. The bulk
+    # endpoint gives us one download rather than a page stream, so this is
+    # the remaining fetch/compute overlap available.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        cards_future = executor.submit(fetch_pauper_cards)
+        known_combos = scrape_known_combos()
+        cards = cards_future.result()
     print(f"\nTotal Pauper cards: {len(cards)}")
 
-    # Extract features
-    card_features = [extract_card_features(c) for c in cards]
+    # Drop duplicate printings; abilities are identical per oracle id
+    cards = dedupe_by_oracle_id(cards)
 
-    # Save card database
-    with open("data/pauper_cards_detailed.json", "w") as f:
-        json.dump(card_features, f, indent=2)
+    # Extract features, streaming each record to the card database as it is
+    # built; the list is kept in memory for the combo/training passes below
+    card_features = []
+    with open("data/pauper_cards_detailed.jsonl", "wb") as f:
+        for card in cards:
+            features = extract_card_features(card)
+            card_features.append(features)
+            f.write(orjson.dumps(features))
+            f.write(b"\n")
 
-    # Get known combos
-    known_combos = scrape_known_combos()
     print(f"Known combos: {len(known_combos)}")
 
     # Generate potential synergies
@@ -436,17 +680,24 @@ def main():
     # Create card analysis examples
     card_examples = []
     for card in card_features[:100]:  # Sample
+        n_abilities = card["abilities_mask"].bit_count()
         card_examples.append(
             {
                 "instruction": "Analyze this Pauper card for combo potential.",
                 "input": f"Card: {card['name']}\nMana Cost: {card['mana_cost']}\nType: {card['type_line']}\nText: {card['oracle_text']}",
-                "output": f"Card Analysis:\n\nType: {card['type_line']}\n"
-                + f"Key Abilities: {', '.join([k for k, v in card['abilities'].items() if v])}\n\n"
-                + f"Combo Potential: "
-                + (
-                    "High"
-                    if sum(card["abilities"].values()) > 2
-                    else "Medium" if sum(card["abilities"].values()) > 0 else "Low"
+                "output": "".join(
+                    [
+                        "Card Analysis:\n\nType: ",
+                        card["type_line"],
+                        "\nKey Abilities: ",
+                        ", ".join(k for k, v in card["abilities"].items() if v),
+                        "\n\nCombo Potential: ",
+                        (
+                            "High"
+                            if n_abilities > 2
+                            else "Medium" if n_abilities > 0 else "Low"
+                        ),
+                    ]
                 ),
             }
         )
@@ -455,14 +706,18 @@ def main():
     all_training_data = reasoning_examples + card_examples
 
     # Save
-    with open("data/combo_training_data.json", "w") as f:
-        json.dump(all_training_data, f, indent=2)
+    with open("data/combo_training_data.jsonl", "wb") as f:
+        for record in all_training_data:
+            f.write(orjson.dumps(record))
+            f.write(b"\n")
 
-    with open("data/known_combos.json", "w") as f:
-        json.dump(known_combos, f, indent=2)
+    Path("data/known_combos.json").write_bytes(
+        orjson.dumps(known_combos, option=orjson.OPT_INDENT_2)
+    )
 
-    with open("data/potential_combos.json", "w") as f:
-        json.dump(potential_combos, f, indent=2)
+    Path("data/potential_combos.json").write_bytes(
+        orjson.dumps(potential_combos, option=orjson.OPT_INDENT_2)
+    )
 
     print(f"\n✓ Data collection complete!")
     print(f"  - Cards: {len(card_features)}")
@@ -1,34 +1,74 @@
-import json
 import requests
-import pandas as pd
+import orjson
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+BULK_DATA_URL = "https://api.scryfall.com/bulk-data/oracle-cards"
+BULK_CACHE_PATH = Path("data/.scryfall_bulk_cache.json")
+
+# Shared session: HTTP keep-alive across requests plus automatic backoff on
+# 429/5xx responses (Retry-After is honored) instead of ad-hoc sleeps
+SESSION = requests.Session()
+SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        max_retries=Retry(
+            total=5,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            respect_retry_after_header=True,
+        )
+    ),
+)
 
 def fetch_pauper_cards():
     """Fetch all Pauper-legal cards from Scryfall API"""
     print("Fetching Pauper-legal cards from Scryfall...")
-    
-    all_cards = []
-    url = "https://api.scryfall.com/cards/search"
-    params = {
-        "q": "legal:pauper",
-        "format": "json",
-        "unique": "prints"
-    }
-    
-    while url:
-        response = requests.get(url, params=params)
-        if response.status_code != 200:
-            print(f"Error: {response.status_code}")
-            break
-            
-        data = response.json()
-        all_cards.extend(data.get("data", []))
-        url = data.get("next_page")
-        params = None  # Only use params on first request
-        print(f"Fetched {len(all_cards)} cards so far...")
-    
+
+    # One bulk-data download replaces the old paginated cards/search crawl
+    meta = SESSION.get(BULK_DATA_URL, timeout=30)
+    if meta.status_code != 200:
+        print(f"Error: {meta.status_code}")
+        return []
+
+    bulk_info = meta.json()
+
+    # Skip the ~100 MB download when Scryfall's bulk export hasn't changed
+    # since the cached copy was written
+    if BULK_CACHE_PATH.exists():
+        cached = orjson.loads(BULK_CACHE_PATH.read_bytes())
+        if cached.get("updated_at") == bulk_info.get("updated_at"):
+            print(f"Bulk data unchanged; using {len(cached['cards'])} cached cards")
+            return cached["cards"]
+
+    print("Downloading bulk card data...")
+    response = SESSION.get(bulk_info["download_uri"], timeout=300)
+    if response.status_code != 200:
+        print(f"Error: {response.status_code}")
+        return []
+
+    all_cards = [
+        c
+        for c in response.json()
+        if c.get("legalities", {}).get("pauper") == "legal"
+    ]
+    print(f"Fetched {len(all_cards)} Pauper-legal cards")
+
+    BULK_CACHE_PATH.parent.mkdir(exist_ok=True)
+    BULK_CACHE_PATH.write_bytes(
+        orjson.dumps({"updated_at": bulk_info.get("updated_at"), "cards": all_cards})
+    )
+
     return all_cards
 
+def dedupe_by_oracle_id(cards):
+    """Keep one printing per oracle id, preserving order"""
+    unique = {}
+    for card in cards:
+        unique.setdefault(card.get("oracle_id") or card.get("name"), card)
+    return list(unique.values())
+
 def process_card_data(cards):
     """Extract relevant information for training"""
     processed_cards = []
@@ -51,6 +91,15 @@ def process_card_data(cards):
     
     return processed_cards
 
+# WUBRG color identity packed into a 5-bit mask for archetype filtering
+_COLOR_BITS = {"W": 1, "U": 2, "B": 4, "R": 8, "G": 16}
+
+def _color_mask(colors):
+    mask = 0
+    for color in colors:
+        mask |= _COLOR_BITS.get(color, 0)
+    return mask
+
 def create_training_examples(cards):
     """Create training examples for deck building and combo identification"""
     examples = []
@@ -85,8 +134,15 @@ def create_training_examples(cards):
         (["R", "G"], "Gruul aggro"),
     ]
     
+    # Pack each card's color identity into a bitmask once; an archetype
+    # match is then a single AND+compare per card
+    ci_masks = [_color_mask(c.get("color_identity") or ()) for c in cards]
+
     for colors, archetype in color_combos:
-        matching_cards = [c for c in cards if set(colors).issubset(set(c.get("color_identity", [])))]
+        required = _color_mask(colors)
+        matching_cards = [
+            cards[i] for i, mask in enumerate(ci_masks) if mask & required == required
+        ]
         if len(matching_cards) > 10:
             card_list = [c["name"] for c in matching_cards[:20]]
             examples.append({
@@ -105,21 +161,27 @@ if __name__ == "__main__":
     # Fetch cards
     cards = fetch_pauper_cards()
     print(f"\nTotal cards fetched: {len(cards)}")
-    
+
+    # Drop duplicate printings; abilities are identical per oracle id
+    cards = dedupe_by_oracle_id(cards)
+    print(f"Unique cards: {len(cards)}")
+
     # Process cards
     processed = process_card_data(cards)
     
     # Save card database
-    with open("data/pauper_cards.json", "w") as f:
-        json.dump(processed, f, indent=2)
-    
+    Path("data/pauper_cards.json").write_bytes(
+        orjson.dumps(processed, option=orjson.OPT_INDENT_2)
+    )
+
     # Create training examples
     training_examples = create_training_examples(processed)
     print(f"Created {len(training_examples)} training examples")
-    
+
     # Save training data
-    with open("data/training_data.json", "w") as f:
-        json.dump(training_examples, f, indent=2)
+    Path("data/training_data.json").write_bytes(
+        orjson.dumps(training_examples, option=orjson.OPT_INDENT_2)
+    )
     
     print("\nData collection complete!")
     print(f"- Pauper cards saved to: data/pauper_cards.json")
@@ -1,54 +1,138 @@
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from transformers import AutoTokenizer, AutoModelForCausalLM, StaticCache
 from peft import PeftModel
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor
 
 MODEL_PATH = "./gemma-mtg-combo-finder"
 BASE_MODEL = "google/gemma-2b-it"
 
+# Prompt plus up to 512 generated tokens must fit in the static KV cache
+MAX_CACHE_LEN = 1536
+
+# One card block in a prompt; shared by combo analysis and suggestions
+CARD_TEMPLATE = "{name} ({mana_cost})\nType: {type_line}\nText: {oracle_text}"
+
+
+def load_records(stem):
+    """Load records from stem.jsonl, falling back to the older stem.json"""
+    jsonl_path = f"{stem}.jsonl"
+    if os.path.exists(jsonl_path):
+        with open(jsonl_path, "r") as f:
+            return [json.loads(line) for line in f]
+    with open(f"{stem}.json", "r") as f:
+        return json.load(f)
+
 
 class ComboExplorer:
     def __init__(self):
         print("Loading Pauper Combo Finder...")
-        self.model, self.tokenizer = self.load_model()
-        self.cards = self.load_cards()
+
+        # Read the card database (disk-bound) while the model loads
+        # (GPU/deserialization-bound) instead of one after the other
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            cards_future = pool.submit(self.load_cards)
+            self.model, self.tokenizer = self.load_model()
+            self.cards = cards_future.result()
+
+        # Case-insensitive name index so find_card is one dict probe
+        # instead of a scan over every card
+        self.card_index = {c["name"].casefold(): c for c in self.cards}
+
+        # Token ids of the fixed chat-header + instruction prefixes, keyed
+        # by instruction (there are only a handful of fixed instructions)
+        self._prefix_ids = {}
+
+        # Stop as soon as the model closes its turn instead of decoding to
+        # the max_new_tokens budget
+        self._stop_ids = [
+            self.tokenizer.eos_token_id,
+            self.tokenizer.convert_tokens_to_ids("<end_of_turn>"),
+        ]
+
+        # Allocate the KV cache once and reuse it for every query instead of
+        # re-allocating hundreds of MB inside each generate() call
+        self.kv_cache = StaticCache(
+            config=self.model.config,
+            max_batch_size=1,
+            max_cache_len=MAX_CACHE_LEN,
+            device=self.model.device,
+            dtype=torch.bfloat16,
+        )
         print(f"✓ Ready! Loaded {len(self.cards)} Pauper cards\n")
 
     def load_model(self):
         tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH)
         base_model = AutoModelForCausalLM.from_pretrained(
-            BASE_MODEL, torch_dtype=torch.float16, device_map="auto"
+            BASE_MODEL,
+            torch_dtype=torch.bfloat16,
+            device_map="auto",
+            attn_implementation="sdpa",
         )
         model = PeftModel.from_pretrained(base_model, MODEL_PATH)
+
+        # Fold the LoRA deltas into the base weights: decode then runs one
+        # GEMM per linear instead of base + adapter matmuls + add
+        model = model.merge_and_unload()
         model.eval()
+
+        # Compile the forward pass so Inductor fuses the pointwise/RMSNorm
+        # chains and captures CUDA graphs around the decode step (compiling
+        # the bound forward keeps generate() on the compiled path). The
+        # first query pays the compile warmup.
+        model.forward = torch.compile(
+            model.forward, mode="reduce-overhead", fullgraph=False
+        )
         return model, tokenizer
 
     def load_cards(self):
-        with open("data/pauper_cards_detailed.json", "r") as f:
-            return json.load(f)
+        return load_records("data/pauper_cards_detailed")
 
     def generate(self, instruction, input_text):
-        prompt = f"""<start_of_turn>user
-{instruction}
-
-{input_text}<end_of_turn>
-<start_of_turn>model
-"""
-        inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
-
+        # The chat header + instruction is one of a few fixed strings; its
+        # token ids are cached so only the variable card text gets
+        # tokenized per call
+        prefix_ids = self._prefix_ids.get(instruction)
+        if prefix_ids is None:
+            prefix = f"<start_of_turn>user\n{instruction}\n\n"
+            prefix_ids = self.tokenizer(prefix, return_tensors="pt").input_ids
+            self._prefix_ids[instruction] = prefix_ids
+
+        tail = f"{input_text}<end_of_turn>\n<start_of_turn>model\n"
+        tail_ids = self.tokenizer(
+            tail, add_special_tokens=False, return_tensors="pt"
+        ).input_ids
+
+        # Pinned memory lets the H2D copy run async instead of blocking
+        # until the prompt tensor lands on the GPU
+        input_ids = torch.cat([prefix_ids, tail_ids], dim=1)
+        if self.model.device.type == "cuda":
+            input_ids = input_ids.pin_memory()
+        input_ids = input_ids.to(self.model.device, non_blocking=True)
+        attention_mask = torch.ones_like(input_ids)
+
+        self.kv_cache.reset()
         with torch.no_grad():
             outputs = self.model.generate(
-                **inputs, max_new_tokens=512, temperature=0.3, top_p=0.9, do_sample=True
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                max_new_tokens=512,
+                temperature=0.3,
+                top_p=0.9,
+                do_sample=True,
+                past_key_values=self.kv_cache,
+                eos_token_id=self._stop_ids,
+                pad_token_id=self.tokenizer.eos_token_id,
             )
 
-        response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-        return response.split("<start_of_turn>model")[-1].strip()
+        # Decode only the freshly generated tokens; re-decoding the prompt
+        # just to split it off again was wasted work
+        new_tokens = outputs[0, input_ids.shape[1] :]
+        return self.tokenizer.decode(new_tokens, skip_special_tokens=True).strip()
 
     def find_card(self, name):
-        for card in self.cards:
-            if card["name"].lower() == name.lower():
-                return card
-        return None
+        return self.card_index.get(name.casefold())
 
     def analyze_combo(self, card_names):
         cards_found = []
@@ -62,15 +146,9 @@ class ComboExplorer:
         if len(cards_found) < 2:
             return "Need at least 2 valid Pauper cards to analyze"
 
-        card_descriptions = []
-        for card in cards_found:
-            card_descriptions.append(
-                f"{card['name']} ({card['mana_cost']})\n"
-                f"Type: {card['type_line']}\n"
-                f"Text: {card['oracle_text']}"
-            )
-
-        input_text = "Cards:\n\n" + "\n\n".join(card_descriptions)
+        input_text = "Cards:\n\n" + "\n\n".join(
+            CARD_TEMPLATE.format_map(card) for card in cards_found
+        )
         instruction = "Analyze if these cards create an infinite combo or powerful synergy in Pauper format. Explain step-by-step."
 
         return self.generate(instruction, input_text)
@@ -81,9 +159,7 @@ class ComboExplorer:
             return f"Card '{card_name}' not found in Pauper format"
 
         instruction = "What cards would combo well with this card in Pauper format?"
-        input_text = f"""{card['name']} ({card['mana_cost']})
-Type: {card['type_line']}
-Text: {card['oracle_text']}"""
+        input_text = CARD_TEMPLATE.format_map(card)
 
         return self.generate(instruction, input_text)
 
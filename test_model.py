@@ -13,11 +13,15 @@ def load_model():
 
     # Load base model
     base_model = AutoModelForCausalLM.from_pretrained(
-        BASE_MODEL, torch_dtype=torch.float16, device_map="auto"
+        BASE_MODEL,
+        torch_dtype=torch.bfloat16,
+        device_map="auto",
+        attn_implementation="sdpa",
     )
 
-    # Load LoRA weights
+    # Load LoRA weights and fold them into the base model for inference
     model = PeftModel.from_pretrained(base_model, MODEL_PATH)
+    model = model.merge_and_unload()
     model.eval()
 
     return model, tokenizer
@@ -36,14 +40,27 @@ def generate_response(model, tokenizer, instruction, input_text):
 
     inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
 
+    # Stop at <end_of_turn>/EOS instead of always decoding 256 tokens
+    stop_ids = [
+        tokenizer.eos_token_id,
+        tokenizer.convert_tokens_to_ids("<end_of_turn>"),
+    ]
+
     with torch.no_grad():
         outputs = model.generate(
-            **inputs, max_new_tokens=256, temperature=0.7, top_p=0.9, do_sample=True
+            **inputs,
+            max_new_tokens=256,
+            temperature=0.7,
+            top_p=0.9,
+            do_sample=True,
+            eos_token_id=stop_ids,
+            pad_token_id=tokenizer.eos_token_id,
         )
 
-    response = tokenizer.decode(outputs[0], skip_special_tokens=True)
-    # Extract just the response part
-    response = response.split("### Response:")[-1].strip()
+    # Decode only the freshly generated tokens instead of re-decoding the
+    # prompt and splitting it off again
+    new_tokens = outputs[0, inputs["input_ids"].shape[1] :]
+    response = tokenizer.decode(new_tokens, skip_special_tokens=True).strip()
 
     return response
 
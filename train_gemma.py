@@ -2,13 +2,11 @@ import torch
 from transformers import (
     AutoTokenizer,
     AutoModelForCausalLM,
-    TrainingArguments,
     BitsAndBytesConfig,
-    TrainerCallback,
 )
 from peft import LoraConfig, get_peft_model, prepare_model_for_kbit_training
-from trl import SFTTrainer
-from datasets import load_dataset
+from trl import SFTConfig, SFTTrainer
+from datasets import Dataset
 import json
 import os
 import sys
@@ -22,16 +20,6 @@ MODEL_NAME = "google/gemma-2b-it"
 OUTPUT_DIR = "./gemma-mtg-combo-finder"
 
 
-# Explicitly clean memory callback
-class EmptyCacheCallback(TrainerCallback):
-    """Frees up memory after every few steps to prevent VRAM creep"""
-
-    def on_step_end(self, args, state, control, **kwargs):
-        if state.global_step % 5 == 0:
-            torch.cuda.empty_cache()
-            gc.collect()
-
-
 def format_instruction(example):
     """Format with clear structure for reasoning"""
     return f"""<start_of_turn>user
@@ -42,20 +30,31 @@ def format_instruction(example):
 {example['output']}<end_of_turn>"""
 
 
-def prepare_dataset(tokenizer):
-    """Load and tokenize training data"""
+def load_records(stem):
+    """Load records from stem.jsonl, falling back to the older stem.json"""
+    jsonl_path = f"{stem}.jsonl"
+    if os.path.exists(jsonl_path):
+        with open(jsonl_path, "r") as f:
+            return [json.loads(line) for line in f]
+    with open(f"{stem}.json", "r") as f:
+        return json.load(f)
+
+
+def prepare_dataset():
+    """Load and format training data"""
     print("Loading combo training data...")
 
-    if not os.path.exists("data/combo_training_data.json"):
-        print("ERROR: data/combo_training_data.json not found!")
+    if not os.path.exists("data/combo_training_data.jsonl") and not os.path.exists(
+        "data/combo_training_data.json"
+    ):
+        print("ERROR: data/combo_training_data.jsonl not found!")
         sys.exit(1)
 
     if not os.path.exists("data/training_data.json"):
         print("ERROR: data/training_data.json not found!")
         sys.exit(1)
 
-    with open("data/combo_training_data.json", "r") as f:
-        combo_data = json.load(f)
+    combo_data = load_records("data/combo_training_data")
 
     with open("data/training_data.json", "r") as f:
         general_data = json.load(f)
@@ -66,30 +65,12 @@ def prepare_dataset(tokenizer):
 
     formatted_all = [{"text": format_instruction(ex)} for ex in all_data]
 
-    # Save formatted data temporarily
-    os.makedirs("data", exist_ok=True)
-    with open("data/formatted_all.json", "w") as f:
-        json.dump(formatted_all, f)
+    # Build the dataset in memory instead of round-tripping through a
+    # temporary json file and the load_dataset json loader; SFTTrainer
+    # tokenizes and packs the "text" column itself
+    all_dataset = Dataset.from_list(formatted_all)
 
-    all_dataset = load_dataset(
-        "json", data_files="data/formatted_all.json", split="train"
-    )
-
-    def tokenize_function(examples):
-        return tokenizer(
-            examples["text"],
-            truncation=True,
-            max_length=MAX_LENGTH,
-            padding=False,
-        )
-
-    tokenized_dataset = all_dataset.map(
-        tokenize_function,
-        batched=True,
-        remove_columns=all_dataset.column_names,
-    )
-
-    return tokenized_dataset.train_test_split(test_size=0.1)
+    return all_dataset.train_test_split(test_size=0.1)
 
 
 def find_latest_checkpoint(output_dir):
@@ -183,9 +164,15 @@ def main():
     model = get_peft_model(model, peft_config)
     model.print_trainable_parameters()
 
+    # At batch size 1 the training step is dispatch-bound; compiling lets
+    # Inductor fuse the pointwise/RMSNorm chains and the small LoRA
+    # matmuls in forward and backward. Needs use_reentrant=False
+    # gradient checkpointing, which is set below.
+    model = torch.compile(model)
+
     # Load dataset
     print("\nPreparing dataset...")
-    dataset = prepare_dataset(tokenizer)
+    dataset = prepare_dataset()
     print(f"✓ Training samples: {len(dataset['train'])}")
     print(f"✓ Validation samples: {len(dataset['test'])}")
 
@@ -193,11 +180,15 @@ def main():
 
     # Training arguments - OPTIMIZED FOR STABILITY
     print("\nConfiguring training...")
-    training_args = TrainingArguments(
+    training_args = SFTConfig(
         output_dir=OUTPUT_DIR,
         num_train_epochs=5,
         per_device_train_batch_size=1,  # Keep strict at 1
         gradient_accumulation_steps=8,
+        # Pack several short examples into each 768-token sequence so a
+        # step isn't spent on one tiny combo example
+        packing=True,
+        max_seq_length=MAX_LENGTH,
         learning_rate=1e-4,
         bf16=True,
         # Stability settings
@@ -211,7 +202,7 @@ def main():
         eval_strategy="steps",
         eval_steps=20,
         warmup_steps=100,
-        optim="paged_adamw_8bit",
+        optim="adamw_8bit",
         lr_scheduler_type="cosine",
         max_grad_norm=0.3,
         report_to="none",
@@ -221,20 +212,12 @@ def main():
 
     # Initialize trainer
     print("\nInitializing trainer...")
-    from transformers import DataCollatorForLanguageModeling
-
-    data_collator = DataCollatorForLanguageModeling(
-        tokenizer=tokenizer,
-        mlm=False,
-    )
-
     trainer = SFTTrainer(
         model=model,
         train_dataset=dataset["train"],
         eval_dataset=dataset["test"],
         args=training_args,
-        data_collator=data_collator,
-        callbacks=[EmptyCacheCallback()],  # Add memory cleaner
+        processing_class=tokenizer,
     )
 
     print("✓ Trainer initialized")